@@ -2,12 +2,15 @@ import numpy as np
 import tkinter as tk
 from tkinter import Canvas
 import math
+import argparse
 
-from wireframe_3d_lib import Camera, Matrix3D, WireframeRenderer, WireframeObject
+from wi3d_replay import Recorder
+from wireframe_3d_lib import Camera, Matrix3D, WireframeRenderer, WireframeObject, BakedAnimation, Viewport, cached_geometry
 
 ### functions for making indivisual parts of a starship
 
 # HULL (cyan part)
+@cached_geometry
 def create_starship_hull():
     vertices = [
         # Front section (sharp tip)
@@ -47,6 +50,7 @@ def create_starship_hull():
     return WireframeObject(vertices, edges, "#00ffff")
 
 # TANK (yellow parts)
+@cached_geometry
 def create_fuel_tank():
     vertices = [
         # Tank front section (circular cross-section)
@@ -88,6 +92,7 @@ def create_fuel_tank():
     
     return WireframeObject(vertices, edges, "#ffff00")
 
+@cached_geometry
 def create_warp_nacelle():
     """warp unit (warp motor)"""
     vertices = [
@@ -145,6 +150,7 @@ def create_warp_nacelle():
     
     return WireframeObject(vertices, edges, "#00ffff")
 
+@cached_geometry
 def create_starship_engine():
     vertices = [
         # Engine body (cylindrical)
@@ -179,6 +185,7 @@ def create_starship_engine():
     
     return WireframeObject(vertices, edges, "#ff0000")
 
+@cached_geometry
 def create_engine_flame(warp = False):
     vertices = []
     edges = []
@@ -230,27 +237,22 @@ def create_engine_flame(warp = False):
 
     return flame
 
-def create_star_field():
-    vertices = []
-    edges = []
-
+@cached_geometry
+def create_star_field(count=2800):
     # Place random stars
     np.random.seed(42)  # For reproducibility
-    for i in range(2800): # rather large value because final movement decided yet
-        x = np.random.uniform(-80, 80)
-        y = np.random.uniform(-80, 80)
-        z = np.random.uniform(-80, 100)
-        vertices.append([x, y, z])
-        x += 0
-        y += 0
-        z += 1     # stars're treated as lines aligned to z axis
-        vertices.append([x, y, z])
-    
-    for i in range(0, len(vertices), 2):
-        edges.append([i, i+1])
+    # rather large count because final movement decided yet
+    stars = np.random.uniform([-80, -80, -80], [80, 80, 100], size=(count, 3))
+    
+    vertices = np.empty((count * 2, 3))
+    vertices[0::2] = stars
+    vertices[1::2] = stars + [0, 0, 1]     # stars're treated as lines aligned to z axis
+    
+    edges = [[i, i+1] for i in range(0, len(vertices), 2)]
     
     return WireframeObject(vertices, edges, "#ffffff")
 
+@cached_geometry
 def create_grid_surface(size=10, grid_spacing=5, y_level=-5):
     """making gridded ground"""
     vertices = []
@@ -273,9 +275,78 @@ def create_grid_surface(size=10, grid_spacing=5, y_level=-5):
     
     return WireframeObject(vertices, edges, "#ff00ff")
 
+def create_scene(renderer, stars=2800):
+    """add star field and starship to renderer, returns the starship parts
+
+    (no Tk needed, the replay harness builds the scene headless with this)
+    """
+    starship_parts = []
+    star_field = create_star_field(stars)
+    renderer.add_object(star_field)
+    
+    # grid surface (not use)
+    #grid_surface = create_grid_surface(size=200, grid_spacing=3, y_level=-10)
+    #renderer.add_object(grid_surface)
+    
+    hull = create_starship_hull()
+    renderer.add_object(hull)
+    starship_parts.append(hull)
+    
+    # left TANK
+    left_tank = create_fuel_tank()
+    left_tank.translate(-2.5, 0, 0)
+    renderer.add_object(left_tank)
+    starship_parts.append(left_tank)
+    
+    # right TANK
+    right_tank = create_fuel_tank()
+    right_tank.translate(2.5, 0, 0)
+    renderer.add_object(right_tank)
+    starship_parts.append(right_tank)
+    
+    # left warp nacelle
+    left_nacelle = create_warp_nacelle()
+    left_nacelle.translate(-3.5, -1, 0)
+    renderer.add_object(left_nacelle)
+    starship_parts.append(left_nacelle)
+    
+    # right warp nacelle
+    right_nacelle = create_warp_nacelle()
+    right_nacelle.translate(3.5, -1, 0)
+    renderer.add_object(right_nacelle)
+    starship_parts.append(right_nacelle)
+    
+    main_engine = create_starship_engine()
+    main_engine.translate(0, -0.5, 0)
+    main_engine.scale(1.5, 1.5, 1.5)
+    renderer.add_object(main_engine)
+    starship_parts.append(main_engine)
+    
+    # engine's FLAME
+    main_flame = create_engine_flame()
+    main_flame.translate(0, -0.5, 0)
+    main_flame.scale(1.5, 1.5, 15.8)   # make it long
+    renderer.add_object(main_flame)
+    starship_parts.append(main_flame)
+    
+    # warp unit's ENERGY FLOW (left)
+    left_warp_effect = create_engine_flame(True)
+    left_warp_effect.translate(-3.5, -1, 0)
+    left_warp_effect.scale(0.8, 0.8, 2)
+    renderer.add_object(left_warp_effect)
+    starship_parts.append(left_warp_effect)
+
+    # warp unit's ENERGY FLOW (right)       
+    right_warp_effect = create_engine_flame(True)
+    right_warp_effect.translate(3.5, -1, 0)
+    right_warp_effect.scale(0.8, 0.8, 2)
+    renderer.add_object(right_warp_effect)
+    starship_parts.append(right_warp_effect)
+    return starship_parts
+
 # Animation class
 class StarshipDemo:
-    def __init__(self):
+    def __init__(self, display_mode="vector", stars=2800, top_view=False):
         self.root = tk.Tk()
         self.root.title("Starship Animation - 3D Wireframe")
         self.root.geometry("1200x900")
@@ -283,88 +354,104 @@ class StarshipDemo:
         # Canvas
         self.canvas = Canvas(self.root, width=1200, height=900, bg='black')
         self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Motion>", self.on_motion)
         
-        self.renderer = WireframeRenderer(self.canvas, 1200, 900)
+        self.renderer = WireframeRenderer(self.canvas, 1200, 900, display_mode)
+        self.renderer.intensity_levels = 32  # fewer, longer polylines
         # Camera settings
         self.camera = Camera([0, 5, 1], [0, 0, 0], [0, 1, 0], aspect=1200/900)
         self.renderer.set_camera(self.camera)
         
-        self.starship_parts = []
+        # picture-in-picture top view (shares the per-frame transforms)
+        self.top_camera = None
+        if top_view:
+            self.top_camera = Camera([0, 25, 0], [0, 0, 0], [0, 0, 1], aspect=320/240)
+            self.renderer.add_viewport(Viewport(self.camera, 0, 0, 1200, 900))
+            self.renderer.add_viewport(Viewport(self.top_camera, 1200 - 330, 900 - 250, 320, 240,
+                                                background="black", outline="#808080"))
+        
+        self.star_count = stars
         # Add objects
         self.setup_scene()
         
         self.time = 0
+        self.frame_index = 0
         self.ship_rotation = 0
+        self.baked = None  # BakedAnimation to replay the loop from
+        self.recorder = None  # wi3d_replay.Recorder, live frames only
         self.animate()
     
     def setup_scene(self):
-        stars = create_star_field()
-        self.renderer.add_object(stars)
-        
-        # grid surface (not use)
-        #grid_surface = create_grid_surface(size=200, grid_spacing=3, y_level=-10)
-        #self.renderer.add_object(grid_surface)
-        
-        hull = create_starship_hull()
-        self.renderer.add_object(hull)
-        self.starship_parts.append(hull)
-        
-        # left TANK
-        left_tank = create_fuel_tank()
-        left_tank.translate(-2.5, 0, 0)
-        self.renderer.add_object(left_tank)
-        self.starship_parts.append(left_tank)
-        
-        # right TANK
-        right_tank = create_fuel_tank()
-        right_tank.translate(2.5, 0, 0)
-        self.renderer.add_object(right_tank)
-        self.starship_parts.append(right_tank)
-        
-        # left warp nacelle
-        left_nacelle = create_warp_nacelle()
-        left_nacelle.translate(-3.5, -1, 0)
-        self.renderer.add_object(left_nacelle)
-        self.starship_parts.append(left_nacelle)
-        
-        # right warp nacelle
-        right_nacelle = create_warp_nacelle()
-        right_nacelle.translate(3.5, -1, 0)
-        self.renderer.add_object(right_nacelle)
-        self.starship_parts.append(right_nacelle)
-        
-        main_engine = create_starship_engine()
-        main_engine.translate(0, -0.5, 0)
-        main_engine.scale(1.5, 1.5, 1.5)
-        self.renderer.add_object(main_engine)
-        self.starship_parts.append(main_engine)
-        
-        # engine's FLAME
-        main_flame = create_engine_flame()
-        main_flame.translate(0, -0.5, 0)
-        main_flame.scale(1.5, 1.5, 15.8)   # make it long
-        self.renderer.add_object(main_flame)
-        self.starship_parts.append(main_flame)
-        
-        # warp unit's ENERGY FLOW (left)
-        left_warp_effect = create_engine_flame(True)
-        left_warp_effect.translate(-3.5, -1, 0)
-        left_warp_effect.scale(0.8, 0.8, 2)
-        self.renderer.add_object(left_warp_effect)
-        self.starship_parts.append(left_warp_effect)
-
-        # warp unit's ENERGY FLOW (right)       
-        right_warp_effect = create_engine_flame(True)
-        right_warp_effect.translate(3.5, -1, 0)
-        right_warp_effect.scale(0.8, 0.8, 2)
-        self.renderer.add_object(right_warp_effect)
-        self.starship_parts.append(right_warp_effect)
+        self.starship_parts = create_scene(self.renderer, self.star_count)
+    
+    def on_motion(self, event):
+        """show the edge under the mouse in the title"""
+        title = "Starship Animation - 3D Wireframe"
+        hit = self.renderer.pick(event.x, event.y, 6)
+        if hit is not None:
+            object_id, edge_id, _, view = hit
+            title += f" - object {object_id}, edge {edge_id}"
+            if view > 0:
+                title += " (top view)"
+        self.root.title(title)
+    
+    def advance(self):
+        """next time step, frame_index counts frames since the loop (re)started"""
+        self.time += 0.03
+        self.frame_index += 1
+        if self.time > 40:
+            self.time = 0
+            self.frame_index = 0
+    
+    def loop_frames(self):
+        """projected frames of one whole loop (time 0 .. 40), in frame_index order"""
+        time, frame_index = self.time, self.frame_index
+        self.time = 0
+        self.frame_index = 0
+        try:
+            while True:
+                self.pose()
+                yield self.renderer.project_scene()
+                self.advance()
+                if self.frame_index == 0:
+                    break
+        finally:
+            # also when the consumer stops early (BakedAnimation.bake when full)
+            self.time, self.frame_index = time, frame_index
+    
+    def bake_meta(self):
+        """what a bake file of loop_frames() depends on"""
+        renderer = self.renderer
+        return {
+            "scene": "starship_demo",
+            "stars": self.star_count,
+            "width": renderer.width,
+            "height": renderer.height,
+            "intensity_levels": renderer.intensity_levels,
+            "viewports": [v.to_dict() for v in renderer.viewports],
+        }
+    
+    def render_live(self):
+        self.pose()
+        return self.renderer.project_scene()
     
     def animate(self):
         """animation"""
-        self.time += 0.03
-        if self.time > 40: self.time = 0
+        self.advance()
+        
+        if self.baked is None:
+            self.pose()
+            if self.recorder is not None:
+                self.recorder.capture()
+            self.renderer.render()
+        else:
+            self.renderer.present(self.baked.frame(self.frame_index, self.render_live))
         
+        # next frame
+        self.root.after(16, self.animate)  # Approximately 60FPS
+    
+    def pose(self):
+        """place camera and parts for self.time"""
         # path of flight (go straight)
         flight_height = -5
         ship_x = self.time * 2
@@ -378,6 +465,11 @@ class StarshipDemo:
         self.camera.target = [ship_x, ship_y, ship_z]
         self.camera.update()
         
+        if self.top_camera is not None:
+            self.top_camera.position[:] = [ship_x, ship_y + 25, ship_z]
+            self.top_camera.target = np.array([ship_x, ship_y, ship_z], dtype=float)
+            self.top_camera.update()
+        
         # bank angle
         ship_bank = math.sin(self.time * 0.7) * 0.3
         ship_pitch = math.sin(self.time * 0.5) * 0.2
@@ -445,15 +537,40 @@ class StarshipDemo:
             stars = self.renderer.objects[0]
             stars.transform_matrix = Matrix3D.identity()
             stars.rotate(0, self.time * 0.05, 0)
-        
-        self.renderer.render()
-        
-        # next frame
-        self.root.after(16, self.animate)  # Approximately 60FPS
     
     def run(self):
         self.root.mainloop()
 
 if __name__ == "__main__":
-    demo = StarshipDemo()
+    parser = argparse.ArgumentParser(description="starship sailing across the galactic ocean")
+    parser.add_argument("--image", action="store_true", help="blit a rasterized frame instead of canvas lines")
+    parser.add_argument("--stars", type=int, default=2800, help="number of stars")
+    parser.add_argument("--top-view", action="store_true", help="picture-in-picture top view")
+    parser.add_argument("--record", metavar="LOG", help="record cameras and transforms for wi3d_replay.py")
+    parser.add_argument("--bake", action="store_true", help="replay the animation loop from a cache")
+    parser.add_argument("--bake-file", help="memory-mapped bake file (written on first use)")
+    parser.add_argument("--bake-mb", type=int, default=256, help="memory cap of the in-memory bake")
+    args = parser.parse_args()
+    if args.record and (args.bake or args.bake_file):
+        # baked frames aren't posed, there'd be nothing to capture
+        parser.error("--record records live frames, it can't be combined with --bake/--bake-file")
+    
+    demo = StarshipDemo("image" if args.image else "vector", args.stars, args.top_view)
+    if args.bake_file:
+        try:
+            demo.baked = BakedAnimation.load(args.bake_file, demo.bake_meta())
+        except FileNotFoundError:
+            pass
+        except ValueError as error:
+            print(f"{error}, baking again")
+        if demo.baked is None:
+            BakedAnimation.save(args.bake_file, demo.loop_frames(), demo.bake_meta())
+            demo.baked = BakedAnimation.load(args.bake_file, demo.bake_meta())
+    elif args.bake:
+        demo.baked = BakedAnimation(args.bake_mb * 2**20)
+        demo.baked.bake(demo.loop_frames())
+    if args.record:
+        demo.recorder = Recorder(args.record, demo.renderer, "starship_demo", {"stars": args.stars})
     demo.run()
+    if demo.recorder is not None:
+        demo.recorder.close()
@@ -0,0 +1,214 @@
+import numpy as np
+import pytest
+
+from wireframe_3d_lib import (SEGMENT_DTYPE, BakedAnimation, Camera, Geometry, Matrix3D,
+                              ProjectedFrame, Viewport, WireframeObject, WireframeRenderer)
+
+def segments(count):
+    return ProjectedFrame.from_records(np.zeros(count, dtype=SEGMENT_DTYPE))
+
+def replay(baked, loop, loops):
+    for _ in range(loops):
+        for index in range(loop):
+            baked.frame(index, lambda: segments(10))
+
+def test_baked_cyclic_replay_over_cap_keeps_hitting():
+    # room for 50 frames of a 100 frame loop
+    baked = BakedAnimation(max_bytes=50 * segments(10).nbytes)
+    replay(baked, 100, 3)
+    assert len(baked) == 50
+    assert baked.nbytes <= baked.max_bytes
+    assert (baked.hits, baked.misses) == (100, 200)
+
+def test_baked_bake_keeps_first_frames_that_fit():
+    baked = BakedAnimation(max_bytes=50 * segments(10).nbytes)
+    baked.bake(segments(10) for _ in range(100))
+    assert sorted(baked.frames) == list(range(50))
+    replay(baked, 100, 3)
+    assert (baked.hits, baked.misses) == (150, 150)
+
+def test_baked_whole_loop_fits():
+    baked = BakedAnimation()
+    baked.bake(segments(10) for _ in range(100))
+    replay(baked, 100, 3)
+    assert (baked.hits, baked.misses) == (300, 0)
+
+def test_rasterize_thick_line_from_records():
+    renderer = WireframeRenderer(None, 100, 100, "image")
+    frame = ProjectedFrame(np.array([[10.0, 50.0, 90.0, 50.0]]), np.array([[255, 0, 0]], dtype=np.uint8),
+                           np.array([3]), np.array([False]), np.array([0]), np.array([0]))
+    live = renderer.rasterize(frame).copy()
+    baked = renderer.rasterize(ProjectedFrame.from_records(frame.to_records()))
+    assert np.array_equal(np.nonzero(live[:, 50, 0])[0], [49, 50, 51])
+    assert np.array_equal(live, baked)
+
+def test_baked_save_load(tmp_path):
+    path = str(tmp_path / "loop.bake")
+    frames = [segments(n) for n in (3, 0, 5)]
+    BakedAnimation.save(path, frames, {"stars": 10})
+    baked = BakedAnimation.load(path, {"stars": 10})
+    assert [len(baked.get(i)) for i in range(len(baked))] == [3, 0, 5]
+    with pytest.raises(ValueError):
+        BakedAnimation.load(path, {"stars": 20})
+
+def test_baked_interrupted_save_leaves_no_file(tmp_path):
+    path = str(tmp_path / "loop.bake")
+    def frames():
+        yield segments(3)
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        BakedAnimation.save(path, frames())
+    assert list(tmp_path.iterdir()) == []
+
+def test_baked_load_rejects_other_record_layout(tmp_path):
+    path = str(tmp_path / "loop.bake")
+    np.zeros(10, dtype=SEGMENT_DTYPE).tofile(path)  # headerless, as before the bake header
+    with pytest.raises(ValueError):
+        BakedAnimation.load(path)
+    BakedAnimation.save(path, [segments(3)])
+    with open(path, "r+b") as f:
+        f.seek(-8, 2)
+        f.write(np.int64(2).tobytes())  # frame count that doesn't match the records
+    with pytest.raises(ValueError):
+        BakedAnimation.load(path)
+
+def test_baked_save_load_keeps_views(tmp_path):
+    path = str(tmp_path / "loop.bake")
+    inset = Viewport(None, 10, 20, 30, 40, "#000000", "#808080")
+    frames = []
+    for n in (3, 5):
+        frame = segments(n + 2)
+        frame.views = [(0, n, Viewport(None, 0, 0, 100, 100)), (n, n + 2, inset)]
+        frames.append(frame)
+    BakedAnimation.save(path, frames)
+    baked = BakedAnimation.load(path)
+    for frame, loaded in zip(frames, (baked.get(0), baked.get(1))):
+        assert len(loaded) == len(frame)
+        assert loaded.views_to_list() == frame.views_to_list()
+
+def test_headless_rgb():
+    renderer = WireframeRenderer(None, 10, 10)
+    assert renderer.rgb("black") == (0, 0, 0)
+    assert renderer.rgb("#808080") == (128, 128, 128)
+    with pytest.raises(ValueError):
+        renderer.rgb("gray50")
+
+def test_colors_near_the_near_plane_saturate():
+    renderer = WireframeRenderer(None, 100, 100)
+    renderer.camera = Camera([0, 0, 0.25], [0, 0, 0], [0, 1, 0])
+    renderer.add_object(WireframeObject([[-0.01, 0, 0.1], [0.01, 0, 0.1]], [[0, 1]]))
+    frame = renderer.project_scene()
+    assert len(frame) == 1
+    assert frame.colors.tolist() == [[0, 255, 0]]
+
+def frame_of(coords, views=None):
+    coords = np.asarray(coords, dtype=float).reshape(-1, 4)
+    k = len(coords)
+    return ProjectedFrame(coords, np.zeros((k, 3), dtype=np.uint8), np.full(k, 2),
+                          np.zeros(k, dtype=bool), np.arange(k), np.arange(k) * 10, views)
+
+def test_pick_inside_inset_ignores_hidden_main_view():
+    renderer = WireframeRenderer(None, 200, 200)
+    main = Viewport(None, 0, 0, 200, 200)
+    inset = Viewport(None, 100, 100, 80, 80, background="black")
+    # segment 0: main view, runs under the inset, segment 1: inset
+    renderer.frame = frame_of([[0, 150, 200, 150], [120, 170, 170, 170]],
+                              [(0, 1, main), (1, 2, inset)])
+    assert renderer.pick(140, 151, 5) is None
+    assert renderer.pick(140, 168, 5) == (1, 10, 2.0, 1)
+    assert renderer.pick(50, 151, 5) == (0, 0, 1.0, 0)
+    # transparent inset: the main view shows through
+    inset.background = None
+    assert renderer.pick(140, 151, 5) == (0, 0, 1.0, 0)
+
+def test_euler_xyz_is_z_y_x_rotation():
+    angles = np.random.default_rng(0).uniform(-4, 4, (20, 3))
+    expected = np.array([Matrix3D.rotate_z(rz) @ Matrix3D.rotate_y(ry) @ Matrix3D.rotate_x(rx)
+                         for rx, ry, rz in angles])
+    assert np.allclose(Matrix3D.euler_xyz(*angles.T), expected)
+    assert np.allclose(Matrix3D.euler_xyz(*angles[0]), expected[0])
+
+def test_compose_is_translate_rotate_scale():
+    rng = np.random.default_rng(1)
+    t, r, s = rng.uniform(-5, 5, (3, 20, 3))
+    expected = np.array([Matrix3D.translate(*ti) @ Matrix3D.euler_xyz(*ri) @ Matrix3D.scale(*si)
+                         for ti, ri, si in zip(t, r, s)])
+    assert np.allclose(Matrix3D.compose(t, r, s), expected)
+    assert np.allclose(Matrix3D.compose(t[0], scale=2),
+                       Matrix3D.translate(*t[0]) @ Matrix3D.scale(2, 2, 2))
+    with pytest.raises(ValueError):
+        Matrix3D.compose(t, scale=(1, 2))
+
+def test_affine_inverse():
+    rng = np.random.default_rng(2)
+    t, r, s = rng.uniform(0.5, 3, (3, 20, 3))
+    stacked = Matrix3D.compose(t, r, s)
+    assert np.allclose(Matrix3D.affine_inverse(stacked) @ stacked, np.eye(4))
+    assert np.allclose(Matrix3D.affine_inverse(stacked[0]) @ stacked[0], np.eye(4))
+
+def test_batched_constructor_shapes():
+    k = np.arange(5.0)
+    assert Matrix3D.translate(1, 2, 3).shape == (4, 4)
+    assert Matrix3D.translate(k, 0, 1).shape == (5, 4, 4)
+    assert Matrix3D.scale(1, k, 1).shape == (5, 4, 4)
+    assert Matrix3D.euler_xyz(0, k[:, None], k).shape == (5, 5, 4, 4)
+    for rotate in (Matrix3D.rotate_x, Matrix3D.rotate_y, Matrix3D.rotate_z):
+        assert rotate(0.5).shape == (4, 4)
+        assert np.allclose(rotate(k), [rotate(a) for a in k])
+    assert np.allclose(Matrix3D.translate(k, 0, 1)[3], Matrix3D.translate(3, 0, 1))
+
+def brute_force_pick(coords, x, y, radius):
+    ax, ay, bx, by = coords.T
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    t = np.clip(((x - ax) * dx + (y - ay) * dy) / np.where(length2 > 0, length2, 1), 0, 1)
+    distance = np.hypot(ax + t * dx - x, ay + t * dy - y)
+    if len(distance) == 0 or distance.min() > radius:
+        return None
+    return distance.min()
+
+def test_pick_matches_brute_force():
+    rng = np.random.default_rng(3)
+    renderer = WireframeRenderer(None, 300, 200)
+    coords = rng.uniform(-20, 320, (200, 4)) * [1, 200 / 300, 1, 200 / 300]
+    coords[:20, 2:] = coords[:20, :2] + rng.uniform(-3, 3, (20, 2))  # short ones
+    coords[20:25, 2:] = coords[20:25, :2]  # points
+    renderer.frame = frame_of(coords)
+    for x, y in rng.uniform(-50, 350, (500, 2)):
+        expected = brute_force_pick(coords, x, y, 8)
+        hit = renderer.pick(x, y, 8)
+        if expected is None:
+            assert hit is None
+        else:
+            object_id, edge_id, distance, view = hit
+            assert np.isclose(distance, expected) and view == 0
+            assert edge_id == object_id * 10
+            assert np.isclose(brute_force_pick(coords[object_id:object_id + 1], x, y, 8), expected)
+
+def test_pick_empty_frame():
+    renderer = WireframeRenderer(None, 300, 200)
+    assert renderer.pick(10, 10) is None
+    renderer.frame = frame_of(np.zeros((0, 4)))
+    assert renderer.pick(10, 10) is None
+    assert renderer.pick(-100, 1000) is None
+
+def check_strips(edges):
+    geometry = Geometry(np.zeros((10, 3)), edges)
+    segments = sorted(tuple(sorted(pair)) for strip in geometry.strips for pair in zip(strip, strip[1:]))
+    assert segments == sorted(tuple(sorted(edge)) for edge in edges)
+    # every edge exactly once, and segment_ids point at the edge each segment draws
+    assert sorted(geometry.segment_ids.tolist()) == list(range(len(edges)))
+    assert np.array_equal(np.sort(geometry.edges[geometry.segment_ids], axis=1),
+                          np.sort(geometry.segment_edges, axis=1))
+    # strip_starts: first segment of each strip, the others continue the previous one
+    assert geometry.strip_starts.sum() == len(geometry.strips)
+    chained = ~geometry.strip_starts[1:]
+    assert np.array_equal(geometry.segment_edges[1:, 0][chained], geometry.segment_edges[:-1, 1][chained])
+
+def test_strips_cover_every_edge_once():
+    cube = [[0, 1], [1, 2], [2, 3], [3, 0], [4, 5], [5, 6], [6, 7], [7, 4],
+            [0, 4], [1, 5], [2, 6], [3, 7]]
+    check_strips(cube)
+    check_strips([[0, 1], [1, 0], [0, 1], [2, 2], [2, 3], [3, 3], [5, 6]])  # duplicates, self-loops
+    check_strips(np.random.default_rng(4).integers(0, 10, (60, 2)).tolist())
+    check_strips([])
@@ -2,8 +2,11 @@ import numpy as np
 import tkinter as tk
 from tkinter import Canvas
 import math
-from wireframe_3d_lib import WireframeObject, WireframeRenderer, Camera, Matrix3D
+import argparse
+from wi3d_replay import Recorder
+from wireframe_3d_lib import WireframeObject, WireframeRenderer, Camera, Matrix3D, cached_geometry
 
+@cached_geometry
 def create_cube(size=1.0):
     s = size / 2
     vertices = [
@@ -22,6 +25,7 @@ def create_cube(size=1.0):
     
     return WireframeObject(vertices, edges)
 
+@cached_geometry
 def create_grid(size=10, divisions=10):
     vertices = []
     edges = []
@@ -50,6 +54,31 @@ def create_grid(size=10, divisions=10):
     
     return WireframeObject(vertices, edges)
 
+def create_scene(renderer):
+    """add grid and cubes to renderer, returns the ring positions of the small cubes"""
+    grid = create_grid(10, 20)
+    renderer.add_object(grid)
+    
+    cube1 = create_cube(1.0)
+    cube1.translate(-2, 1, 0)
+    renderer.add_object(cube1)
+    
+    cube2 = create_cube(1.5)
+    cube2.translate(2, 0.75, -1)
+    renderer.add_object(cube2)
+    
+    cube3 = create_cube(0.8)
+    cube3.translate(0, 2, 1)
+    renderer.add_object(cube3)
+
+    angles = np.linspace(0, np.pi*2, 30)
+    points = list(zip(3*np.cos(angles), 3*np.sin(angles)))
+    for x,y in points:
+        c = create_cube(0.4)
+        c.translate(0, x, y)
+        renderer.add_object(c)
+    return points
+
 class WireframeDemo:
     def __init__(self):
         self.root = tk.Tk()
@@ -61,6 +90,7 @@ class WireframeDemo:
         self.canvas.pack(fill=tk.BOTH, expand=True)
         
         self.renderer = WireframeRenderer(self.canvas, 1000, 800)
+        self.renderer.intensity_levels = 32  # fewer, longer polylines
         
         self.camera = Camera([5.0, 3.0, 8.0], [0.0, 0.0, 0.0], [0.0, 1.0, 0.0], aspect=1000/800)
         self.renderer.set_camera(self.camera)
@@ -68,31 +98,11 @@ class WireframeDemo:
         self.setup_scene()
         
         self.angle = 0
+        self.recorder = None  # wi3d_replay.Recorder
         self.animate()
     
     def setup_scene(self):
-        grid = create_grid(10, 20)
-        self.renderer.add_object(grid)
-        
-        cube1 = create_cube(1.0)
-        cube1.translate(-2, 1, 0)
-        self.renderer.add_object(cube1)
-        
-        cube2 = create_cube(1.5)
-        cube2.translate(2, 0.75, -1)
-        self.renderer.add_object(cube2)
-        
-        cube3 = create_cube(0.8)
-        cube3.translate(0, 2, 1)
-        self.renderer.add_object(cube3)
-
-        angles = np.linspace(0, np.pi*2, 30)
-        self.points = list(zip(3*np.cos(angles), 3*np.sin(angles)))
-        for x,y in self.points:
-            c = create_cube(0.4)
-            c.translate(0, x, y)
-            self.renderer.add_object(c)
-
+        self.points = create_scene(self.renderer)
     
     def animate(self):
         self.angle += 0.02
@@ -118,13 +128,19 @@ class WireframeDemo:
             cube3.translate(0, 2, 1)
             cube3.rotate(self.angle * 0.3, 0, self.angle * 0.8)
 
-        for i in range(4, len(self.renderer.objects)):
-            c = self.renderer.objects[i]
-            c.transform_matrix = Matrix3D.identity()
-            c.rotate(self.angle * 0.2, 0, self.angle* 0.3*i)
-            c.translate(0, self.points[i-4][0], self.points[i-4][1])
-            c.rotate(self.angle * 0.2, 0, self.angle* 0.3)
+        # ring cubes: rotate, move out to their point, rotate again, all in one batch
+        ring = self.renderer.objects[4:]
+        if ring:
+            i = np.arange(4, len(self.renderer.objects))
+            points = np.asarray(self.points[:len(ring)], dtype=float)
+            spin = Matrix3D.euler_xyz(self.angle * 0.2, 0, self.angle * 0.3 * i)
+            move = Matrix3D.translate(0, points[:, 0], points[:, 1])
+            orbit = Matrix3D.euler_xyz(self.angle * 0.2, 0, self.angle * 0.3)
+            for c, matrix in zip(ring, orbit @ move @ spin):
+                c.transform_matrix = matrix
         
+        if self.recorder is not None:
+            self.recorder.capture()
         self.renderer.render()
         
         self.root.after(10, self.animate)
@@ -133,5 +149,12 @@ class WireframeDemo:
         self.root.mainloop()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="gridded demo")
+    parser.add_argument("--record", metavar="LOG", help="record cameras and transforms for wi3d_replay.py")
+    args = parser.parse_args()
     demo = WireframeDemo()
+    if args.record:
+        demo.recorder = Recorder(args.record, demo.renderer, "wi3d_demo")
     demo.run()
+    if demo.recorder is not None:
+        demo.recorder.close()
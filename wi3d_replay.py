@@ -0,0 +1,208 @@
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import struct
+import sys
+import time
+import numpy as np
+
+from wireframe_3d_lib import Camera, Viewport, WireframeRenderer
+
+# log file: MAGIC, uint32 header length, json header, then fixed size frame records
+MAGIC = b"WI3DLOG1"
+CAMERA_PARAMS = 13  # position(3), target(3), up(3), fov, aspect, near, far
+
+def frame_dtype(cameras, objects):
+    return np.dtype([
+        ("cameras", "<f8", (cameras, CAMERA_PARAMS)),
+        ("transforms", "<f8", (objects, 4, 4)),
+    ])
+
+def camera_params(camera):
+    return np.concatenate([camera.position, np.asarray(camera.target, dtype=float), camera.up,
+                           [camera.fov, camera.aspect, camera.near, camera.far]])
+
+def set_camera_params(camera, params):
+    camera.position = params[0:3].copy()
+    camera.target = params[3:6].copy()
+    camera.up = params[6:9].copy()
+    camera.fov, camera.aspect, camera.near, camera.far = params[9:13].tolist()
+    camera.update()
+
+def hex_color(renderer, color):
+    """any color the renderer knows -> "#rrggbb" (a headless replay can't look up Tk names)"""
+    if color is None:
+        return None
+    return "#%02x%02x%02x" % renderer.rgb(color)
+
+class Recorder:
+    """writes camera parameters and object transforms of every frame to a log
+
+    scene: module with create_scene(renderer, **scene_args) to rebuild the objects
+    """
+    def __init__(self, path, renderer, scene, scene_args=None):
+        self.renderer = renderer
+        self.file = open(path, "wb")
+        viewports = [dict(v.to_dict(), background=hex_color(renderer, v.background),
+                          outline=hex_color(renderer, v.outline))
+                     for v in renderer.viewports]
+        header = {
+            "scene": scene,
+            "scene_args": scene_args or {},
+            "width": renderer.width,
+            "height": renderer.height,
+            "objects": len(renderer.objects),
+            "cameras": len(renderer.get_viewports()),
+            "viewports": viewports,
+            "f_time": renderer.f_time,
+            "w_time": renderer.w_time,
+            "intensity_levels": renderer.intensity_levels,
+        }
+        data = json.dumps(header).encode()
+        self.file.write(MAGIC + struct.pack("<I", len(data)) + data)
+        self.record = np.zeros(1, dtype=frame_dtype(header["cameras"], header["objects"]))
+        self.frames = 0
+
+    def capture(self):
+        """call after posing the scene, before rendering it"""
+        record = self.record[0]
+        for i, viewport in enumerate(self.renderer.get_viewports()):
+            record["cameras"][i] = camera_params(viewport.camera)
+        for i, obj in enumerate(self.renderer.objects):
+            record["transforms"][i] = obj.transform_matrix
+        self.record.tofile(self.file)
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+
+def read_log(path):
+    """returns (header, frame records), the records are memory-mapped"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not a wireframe log")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+    dtype = frame_dtype(header["cameras"], header["objects"])
+    offset = len(MAGIC) + 4 + length
+    if os.path.getsize(path) - offset < dtype.itemsize:
+        return header, np.zeros(0, dtype=dtype)
+    return header, np.memmap(path, dtype=dtype, mode="r", offset=offset)
+
+def frame_hash(frame, decimals):
+    """hash of the segments, coordinates rounded to decimals"""
+    records = frame.to_records()
+    records["coords"] = np.round(records["coords"], decimals) + 0.0  # no -0.0
+    return hashlib.sha1(records.tobytes()).hexdigest()
+
+def build_renderer(header, display_mode="vector"):
+    """headless WireframeRenderer with the scene and viewports described by a log header"""
+    renderer = WireframeRenderer(None, header["width"], header["height"], display_mode)
+    importlib.import_module(header["scene"]).create_scene(renderer, **header["scene_args"])
+    if len(renderer.objects) != header["objects"]:
+        raise ValueError(f"scene has {len(renderer.objects)} objects, "
+                         f"log has {header['objects']}")
+    for v in header["viewports"]:
+        camera = Camera([0, 0, 5], [0, 0, 0], [0, 1, 0])
+        renderer.add_viewport(Viewport.from_dict(v, camera))
+    renderer.f_time = header["f_time"]
+    renderer.w_time = header["w_time"]
+    renderer.intensity_levels = header["intensity_levels"]
+    return renderer
+
+class Replayer:
+    """feeds a log through a headless WireframeRenderer
+
+    hash_mode "segments": hash the projected segments and colors
+    hash_mode "framebuffer": hash the rasterized image
+    """
+    def __init__(self, path, hash_mode="segments", decimals=6):
+        if hash_mode not in ("segments", "framebuffer"):
+            raise ValueError(f"unknown hash mode: {hash_mode}")
+        self.hash_mode = hash_mode
+        self.decimals = decimals
+        self.header, self.records = read_log(path)
+        display_mode = "image" if hash_mode == "framebuffer" else "vector"
+        self.renderer = build_renderer(self.header, display_mode)
+
+    def run(self):
+        """returns per-frame hashes and render times (seconds)"""
+        renderer = self.renderer
+        hashes = []
+        times = []
+        for record in self.records:
+            cameras = [v.camera for v in renderer.get_viewports()]
+            for camera, params in zip(cameras, record["cameras"]):
+                set_camera_params(camera, params)
+            for obj, matrix in zip(renderer.objects, record["transforms"]):
+                obj.transform_matrix = np.array(matrix)
+
+            start = time.perf_counter()
+            frame = renderer.project_scene()
+            if self.hash_mode == "framebuffer":
+                fb = renderer.rasterize(frame)
+            times.append(time.perf_counter() - start)
+
+            if self.hash_mode == "framebuffer":
+                hashes.append(hashlib.sha1(fb.tobytes()).hexdigest())
+            else:
+                hashes.append(frame_hash(frame, self.decimals))
+        return hashes, times
+
+def compare(baseline, hashes, times, time_tolerance=0.10, max_mismatch=0):
+    """check a replay against a baseline
+
+    time_tolerance: allowed slowdown of the median frame time (0.10: 10% slower)
+    max_mismatch: number of frames allowed to hash differently
+    """
+    mismatched = [i for i, (a, b) in enumerate(zip(baseline["hashes"], hashes)) if a != b]
+    mismatched += list(range(min(len(hashes), len(baseline["hashes"])),
+                             max(len(hashes), len(baseline["hashes"]))))
+    base_time = float(np.median(baseline["times"])) if baseline["times"] else 0.0
+    new_time = float(np.median(times)) if times else 0.0
+    ratio = new_time / base_time if base_time > 0 else 1.0
+    return {
+        "frames": len(hashes),
+        "mismatched": mismatched,
+        "baseline_median": base_time,
+        "median": new_time,
+        "ratio": ratio,
+        "ok": len(mismatched) <= max_mismatch and ratio <= 1 + time_tolerance,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="replay a wireframe log headless, hash and time every frame")
+    parser.add_argument("log")
+    parser.add_argument("--hash", choices=["segments", "framebuffer"], default="segments")
+    parser.add_argument("--decimals", type=int, default=6, help="coordinate rounding of segment hashes")
+    parser.add_argument("--save-baseline", metavar="FILE", help="store hashes and timing as a baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against a stored baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.10, help="allowed median slowdown")
+    parser.add_argument("--max-mismatch", type=int, default=0, help="allowed differing frames")
+    args = parser.parse_args(argv)
+
+    hashes, times = Replayer(args.log, args.hash, args.decimals).run()
+    print(f"{len(hashes)} frames, median {np.median(times) * 1000:.3f} ms" if times else "0 frames")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"log": args.log, "hash": args.hash, "decimals": args.decimals,
+                       "hashes": hashes, "times": times}, f)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline["hash"], baseline["decimals"]) != (args.hash, args.decimals):
+            parser.error("baseline was made with other --hash/--decimals")
+        result = compare(baseline, hashes, times, args.time_tolerance, args.max_mismatch)
+        print(f"mismatched frames: {len(result['mismatched'])} {result['mismatched'][:10]}")
+        print(f"median {result['median'] * 1000:.3f} ms vs baseline "
+              f"{result['baseline_median'] * 1000:.3f} ms (x{result['ratio']:.2f})")
+        print("OK" if result["ok"] else "FAILED")
+        return 0 if result["ok"] else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,407 @@
+import argparse
+import asyncio
+import json
+import os
+import queue
+import signal
+import socket
+import stat
+import struct
+import threading
+import time
+import tkinter as tk
+from multiprocessing import resource_tracker, shared_memory
+from tkinter import Canvas
+import numpy as np
+
+from wi3d_replay import CAMERA_PARAMS, build_renderer, read_log, set_camera_params
+from wireframe_3d_lib import SEGMENT_DTYPE, ProjectedFrame, WireframeRenderer
+
+# message: uint32 header length, uint32 payload length, json header, payload bytes
+#
+# controller -> server
+#   {"type": "scene", <log header>}               rebuild the scene (see wi3d_replay.Recorder),
+#                                                 "scene" must be one of SCENES
+#   {"type": "camera", "index": i, "params": [13 floats]}
+#   {"type": "transforms"} + (N, 4, 4) float64    transform_matrix of every object
+#   {"type": "render"}                            render one frame for every viewer
+# viewer -> server
+#   {"type": "hello", "format": "segments" | "framebuffer", "shm": true}
+#   {"type": "ack", "index": n}                   done with frame n (and its shared memory)
+# server -> viewer
+#   {"type": "welcome", "width": w, "height": h}
+#   {"type": "frame", "index": n, "format": ..., "shape": [...], "shm": name or null}
+#       segments: SEGMENT_DTYPE records, framebuffer: (height, width, 3) uint8
+#       segments frames also have "views" (ProjectedFrame.views_to_list)
+#       the data is in shared memory "shm", or the payload if shm is null
+#       with shm, "blocks" lists the server's current blocks of that format (the
+#       others are gone, viewers can unmap them)
+# server -> anyone
+#   {"type": "error", "message": "..."}           message rejected (connection stays open)
+
+# scene modules a "scene" message may name (build_renderer imports them)
+SCENES = ("starship_demo", "wi3d_demo")
+
+def pack_message(header, payload=b""):
+    data = json.dumps(header).encode()
+    return struct.pack("<II", len(data), len(payload)) + data + payload
+
+async def read_message(reader):
+    header_length, payload_length = struct.unpack("<II", await reader.readexactly(8))
+    header = json.loads(await reader.readexactly(header_length))
+    payload = await reader.readexactly(payload_length) if payload_length else b""
+    return header, payload
+
+def recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("server closed the connection")
+        data += chunk
+    return bytes(data)
+
+def recv_message(sock):
+    header_length, payload_length = struct.unpack("<II", recv_exactly(sock, 8))
+    header = json.loads(recv_exactly(sock, header_length))
+    payload = recv_exactly(sock, payload_length) if payload_length else b""
+    return header, payload
+
+def attach_shared_memory(name):
+    """map a block the server owns (and don't let our resource tracker unlink it)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+class MessageError(Exception):
+    """malformed or unexpected message, answered with an "error" message"""
+
+class SharedSlot:
+    def __init__(self, size):
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 4096))
+        self.holders = set()  # viewers still reading it
+
+class SharedSlots:
+    """shared memory blocks frames are written to, reused once no viewer holds them"""
+    def __init__(self):
+        self.slots = []
+
+    def write(self, array):
+        slot = next((s for s in self.slots if not s.holders and s.shm.size >= array.nbytes), None)
+        if slot is None:
+            # replace an idle block that is too small, or add one
+            idle = next((s for s in self.slots if not s.holders), None)
+            if idle is not None:
+                self.slots.remove(idle)
+                idle.shm.close()
+                idle.shm.unlink()
+            slot = SharedSlot(array.nbytes * 2)
+            self.slots.append(slot)
+        np.ndarray(array.shape, array.dtype, buffer=slot.shm.buf)[...] = array
+        return slot
+
+    def close(self):
+        for slot in self.slots:
+            slot.shm.close()
+            slot.shm.unlink()
+        self.slots = []
+
+class Viewer:
+    def __init__(self, writer, format, use_shm):
+        self.writer = writer
+        self.format = format
+        self.use_shm = use_shm
+        self.waiting = False  # frame sent, no ack yet
+        self.slot = None
+
+    def release(self):
+        self.waiting = False
+        if self.slot is not None:
+            self.slot.holders.discard(self)
+            self.slot = None
+
+class RenderServer:
+    """renders the scene once per frame and serves it to every connected viewer
+
+    viewers that haven't acked their last frame skip frames instead of queueing them.
+    frames are written to each viewer's transport without waiting for it to drain,
+    a slow viewer never holds up the others.
+    max_buffered: viewers with more unsent bytes than this skip frames too
+    """
+    def __init__(self, path, max_buffered=16 * 2**20):
+        self.path = path
+        self.max_buffered = max_buffered
+        self.renderer = None
+        self.viewers = []
+        self.slots = {"segments": SharedSlots(), "framebuffer": SharedSlots()}
+        self.frame_index = 0
+
+    async def serve(self):
+        self.remove_stale_socket()
+        server = await asyncio.start_unix_server(self.handle, self.path)
+        # SIGTERM stops serving like Ctrl-C does, so the cleanup below runs
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            loop.remove_signal_handler(signal.SIGTERM)
+            for slots in self.slots.values():
+                slots.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def remove_stale_socket(self):
+        """unlink a socket left by a server that is gone, refuse to take over a live one"""
+        if not os.path.exists(self.path):
+            return
+        if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+            raise RuntimeError(f"{self.path} exists and isn't a socket")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(self.path)
+        else:
+            raise RuntimeError(f"a server is already running on {self.path}")
+        finally:
+            probe.close()
+
+    async def handle(self, reader, writer):
+        viewer = None
+        try:
+            while True:
+                try:
+                    header, payload = await read_message(reader)
+                    viewer = self.dispatch(header, payload, writer, viewer)
+                except MessageError as error:
+                    writer.write(pack_message({"type": "error", "message": str(error)}))
+                except ValueError as error:  # bad json, or a scene build_renderer refused
+                    writer.write(pack_message({"type": "error", "message": f"bad message: {error}"}))
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass  # disconnected, or server shutting down
+        finally:
+            if viewer is not None:
+                viewer.release()
+                self.viewers.remove(viewer)
+            writer.close()
+
+    def dispatch(self, header, payload, writer, viewer):
+        """handle one message, returns the connection's Viewer (None for controllers)"""
+        kind = header.get("type") if isinstance(header, dict) else None
+        if kind == "hello":
+            if viewer is not None:
+                raise MessageError("hello sent twice")
+            format = header.get("format", "segments")
+            if format not in self.slots:
+                raise MessageError(f"unknown format {format!r}")
+            viewer = Viewer(writer, format, bool(header.get("shm", True)))
+            self.viewers.append(viewer)
+            if self.renderer is not None:
+                self.send(viewer, self.welcome())
+        elif kind == "ack":
+            if viewer is not None:
+                viewer.release()
+        elif kind == "scene":
+            # build_renderer imports the module, only known scenes
+            if header.get("scene") not in SCENES:
+                raise MessageError(f"unknown scene {header.get('scene')!r}, one of {', '.join(SCENES)}")
+            try:
+                self.renderer = build_renderer(header, "image")
+            except (KeyError, TypeError) as error:
+                raise MessageError(f"bad scene header: {error!r}")
+            for v in self.viewers:
+                self.send(v, self.welcome())
+        elif kind not in ("camera", "transforms", "render"):
+            raise MessageError(f"unknown message type {kind!r}")
+        elif self.renderer is None:
+            raise MessageError("no scene yet")
+        elif kind == "camera":
+            viewports = self.renderer.get_viewports()
+            index = header.get("index")
+            if not isinstance(index, int) or not 0 <= index < len(viewports):
+                raise MessageError(f"camera index {index!r} out of range 0..{len(viewports) - 1}")
+            try:
+                params = np.array(header.get("params"), dtype=float)
+            except (TypeError, ValueError):
+                params = None
+            if params is None or params.shape != (CAMERA_PARAMS,):
+                raise MessageError(f"camera params: {CAMERA_PARAMS} numbers")
+            set_camera_params(viewports[index].camera, params)
+        elif kind == "transforms":
+            if len(payload) % 128:
+                raise MessageError(f"transforms: {len(payload)} bytes isn't a whole number of 4x4 float64")
+            matrices = np.frombuffer(payload, dtype="<f8").reshape(-1, 4, 4)
+            if len(matrices) != len(self.renderer.objects):
+                raise MessageError(f"transforms: {len(matrices)} matrices for "
+                                   f"{len(self.renderer.objects)} objects")
+            for obj, matrix in zip(self.renderer.objects, matrices):
+                obj.transform_matrix = matrix.copy()
+        else:
+            self.render()
+        return viewer
+
+    def welcome(self):
+        return {"type": "welcome", "width": self.renderer.width, "height": self.renderer.height}
+
+    def send(self, viewer, header, payload=b""):
+        """queue a message on the viewer's transport (no drain, see max_buffered)"""
+        if not viewer.writer.is_closing():
+            viewer.writer.write(pack_message(header, payload))
+
+    def ready(self, viewer):
+        return (not viewer.waiting and not viewer.writer.is_closing()
+                and viewer.writer.transport.get_write_buffer_size() <= self.max_buffered)
+
+    def render(self):
+        frame = self.renderer.project_scene()
+        self.frame_index += 1
+        ready = [v for v in self.viewers if self.ready(v)]
+        for format in {v.format for v in ready}:
+            if format == "framebuffer":
+                array = self.renderer.rasterize(frame)
+            else:
+                array = frame.to_records()
+            viewers = [v for v in ready if v.format == format]
+
+            # one copy into shared memory for all of them, or inline bytes
+            slot = None
+            if any(v.use_shm for v in viewers):
+                slot = self.slots[format].write(array)
+            payload = array.tobytes() if not all(v.use_shm for v in viewers) else b""
+
+            header = {"type": "frame", "index": self.frame_index, "format": format,
+                      "shape": list(array.shape)}
+            blocks = [s.shm.name for s in self.slots[format].slots]
+            if format == "segments":
+                header["views"] = frame.views_to_list()
+            for v in viewers:
+                v.waiting = True
+                if v.use_shm:
+                    v.slot = slot
+                    slot.holders.add(v)
+                    self.send(v, dict(header, shm=slot.shm.name, blocks=blocks))
+                else:
+                    self.send(v, dict(header, shm=None), payload)
+
+class ViewerClient:
+    """thin Tk client, shows the frames of a RenderServer"""
+    def __init__(self, path, format="segments", display_mode="vector", use_shm=True):
+        self.root = tk.Tk()
+        self.root.title("Wireframe viewer")
+        self.root.configure(bg='black')
+        self.canvas = Canvas(self.root, width=1200, height=900, bg='black')
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        if format == "framebuffer":
+            display_mode = "image"
+        self.display_mode = display_mode
+        self.renderer = None
+        self.shms = {}
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.sock.sendall(pack_message({"type": "hello", "format": format, "shm": use_shm}))
+        self.messages = queue.Queue()
+        threading.Thread(target=self.receive, daemon=True).start()
+        self.poll()
+
+    def receive(self):
+        try:
+            while True:
+                self.messages.put(recv_message(self.sock))
+        except (ConnectionError, OSError):
+            self.messages.put(None)
+
+    def poll(self):
+        try:
+            while True:
+                message = self.messages.get_nowait()
+                if message is None:
+                    self.root.title("Wireframe viewer (disconnected)")
+                    return
+                self.handle(*message)
+        except queue.Empty:
+            pass
+        self.root.after(5, self.poll)
+
+    def handle(self, header, payload):
+        if header["type"] == "welcome":
+            self.canvas.configure(width=header["width"], height=header["height"])
+            self.renderer = WireframeRenderer(self.canvas, header["width"], header["height"],
+                                              self.display_mode)
+        elif header["type"] == "frame" and self.renderer is not None:
+            if header["shm"] is not None:
+                # drop blocks the server has replaced
+                for name in [n for n in self.shms if n not in header["blocks"]]:
+                    self.shms.pop(name).close()
+                if header["shm"] not in self.shms:
+                    self.shms[header["shm"]] = attach_shared_memory(header["shm"])
+                buffer = self.shms[header["shm"]].buf
+            else:
+                buffer = payload
+            shape = tuple(header["shape"])
+            if header["format"] == "framebuffer":
+                self.renderer.put_image(np.ndarray(shape, np.uint8, buffer=buffer))
+            else:
+                frame = ProjectedFrame.from_records(np.ndarray(shape, SEGMENT_DTYPE, buffer=buffer))
+                frame.views = ProjectedFrame.views_from_list(header["views"])
+                self.renderer.present(frame)
+                self.renderer.frame = None  # don't keep a view of the shared block
+            self.sock.sendall(pack_message({"type": "ack", "index": header["index"]}))
+
+    def run(self):
+        self.root.mainloop()
+
+def play(path, log, fps=60, loop=True):
+    """controller: send a recorded log (wi3d_replay) to the server frame by frame"""
+    header, records = read_log(log)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    sock.sendall(pack_message(dict(header, type="scene")))
+    while True:
+        for record in records:
+            start = time.perf_counter()
+            for i, params in enumerate(record["cameras"]):
+                sock.sendall(pack_message({"type": "camera", "index": i, "params": params.tolist()}))
+            sock.sendall(pack_message({"type": "transforms"},
+                                      np.ascontiguousarray(record["transforms"]).tobytes()))
+            sock.sendall(pack_message({"type": "render"}))
+            time.sleep(max(0.0, 1 / fps - (time.perf_counter() - start)))
+        if not loop:
+            break
+    sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="wireframe render server, viewers and log player")
+    parser.add_argument("--socket", default="/tmp/wi3d.sock", help="unix domain socket path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="run the render server")
+    view = commands.add_parser("view", help="Tk viewer")
+    view.add_argument("--format", choices=["segments", "framebuffer"], default="segments")
+    view.add_argument("--image", action="store_true", help="rasterize segments locally")
+    view.add_argument("--no-shm", action="store_true", help="frames inline over the socket")
+    player = commands.add_parser("play", help="drive the server with a recorded log")
+    player.add_argument("log")
+    player.add_argument("--fps", type=float, default=60)
+    player.add_argument("--once", action="store_true", help="don't loop")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            asyncio.run(RenderServer(args.socket).serve())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass  # Ctrl-C, SIGTERM
+        except RuntimeError as error:
+            parser.exit(1, f"{error}\n")
+    elif args.command == "view":
+        ViewerClient(args.socket, args.format, "image" if args.image else "vector",
+                     not args.no_shm).run()
+    else:
+        play(args.socket, args.log, args.fps, not args.once)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,46 @@
 import math
+import functools
+import inspect
+import itertools
+import json
+import os
+import struct
 import numpy as np
 import tkinter as tk
 
+SCALAR_TYPES = (int, float, np.integer, np.floating)
+
+def batch_params(*values):
+    """broadcast scalar or array parameters, returns (values, batch shape)"""
+    if all(isinstance(v, SCALAR_TYPES) for v in values):
+        return values, ()
+    arrays = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in values])
+    return arrays, arrays[0].shape
+
+def identity_with(shape, *entries):
+    """identity (4, 4), or (*shape, 4, 4) of them, with ((row, col), value) entries set"""
+    if shape == ():
+        mat = np.eye(4)
+        for index, value in entries:
+            mat[index] = value
+        return mat
+    mat = np.zeros(shape + (4, 4))
+    mat[..., [0, 1, 2, 3], [0, 1, 2, 3]] = 1
+    for (row, col), value in entries:
+        mat[..., row, col] = value
+    return mat
+
+def cos_sin(angle):
+    if isinstance(angle, SCALAR_TYPES):
+        return math.cos(angle), math.sin(angle)
+    angle = np.asarray(angle, dtype=float)
+    return np.cos(angle), np.sin(angle)
+
 class Matrix3D:
-    """matrix for 3D"""
+    """matrix for 3D
+
+    constructors take scalars (-> (4, 4)) or arrays (-> stacked (K, 4, 4))
+    """
     
     @staticmethod
     def identity():
@@ -11,56 +48,82 @@ class Matrix3D:
     
     @staticmethod
     def translate(tx, ty, tz):
-        mat = np.eye(4)
-        mat[0, 3] = tx
-        mat[1, 3] = ty
-        mat[2, 3] = tz
-        return mat
+        (tx, ty, tz), shape = batch_params(tx, ty, tz)
+        return identity_with(shape, ((0, 3), tx), ((1, 3), ty), ((2, 3), tz))
     
     @staticmethod
     def scale(sx, sy, sz):
-        mat = np.eye(4)
-        mat[0, 0] = sx
-        mat[1, 1] = sy
-        mat[2, 2] = sz
-        return mat
+        (sx, sy, sz), shape = batch_params(sx, sy, sz)
+        return identity_with(shape, ((0, 0), sx), ((1, 1), sy), ((2, 2), sz))
     
     @staticmethod
     def rotate_x(angle):
         """X axis"""
-        mat = np.eye(4)
-        c = math.cos(angle)
-        s = math.sin(angle)
-        mat[1, 1] = c
-        mat[1, 2] = -s
-        mat[2, 1] = s
-        mat[2, 2] = c
-        return mat
+        c, s = cos_sin(angle)
+        return identity_with(np.shape(c), ((1, 1), c), ((1, 2), -s), ((2, 1), s), ((2, 2), c))
     
     @staticmethod
     def rotate_y(angle):
         """Y axis"""
-        mat = np.eye(4)
-        c = math.cos(angle)
-        s = math.sin(angle)
-        mat[0, 0] = c
-        mat[0, 2] = s
-        mat[2, 0] = -s
-        mat[2, 2] = c
-        return mat
+        c, s = cos_sin(angle)
+        return identity_with(np.shape(c), ((0, 0), c), ((0, 2), s), ((2, 0), -s), ((2, 2), c))
     
     @staticmethod
     def rotate_z(angle):
         """Z axis"""
-        mat = np.eye(4)
-        c = math.cos(angle)
-        s = math.sin(angle)
-        mat[0, 0] = c
-        mat[0, 1] = -s
-        mat[1, 0] = s
-        mat[1, 1] = c
+        c, s = cos_sin(angle)
+        return identity_with(np.shape(c), ((0, 0), c), ((0, 1), -s), ((1, 0), s), ((1, 1), c))
+    
+    @staticmethod
+    def euler_xyz(rx, ry, rz):
+        """rotate_z(rz) @ rotate_y(ry) @ rotate_x(rx), without the matmuls"""
+        (rx, ry, rz), shape = batch_params(rx, ry, rz)
+        cx, sx = cos_sin(rx)
+        cy, sy = cos_sin(ry)
+        cz, sz = cos_sin(rz)
+        return identity_with(shape,
+            ((0, 0), cz * cy), ((0, 1), cz * (sy * sx) - sz * cx), ((0, 2), cz * (sy * cx) + sz * sx),
+            ((1, 0), sz * cy), ((1, 1), sz * (sy * sx) + cz * cx), ((1, 2), sz * (sy * cx) - cz * sx),
+            ((2, 0), -sy), ((2, 1), cy * sx), ((2, 2), cy * cx))
+    
+    @staticmethod
+    def compose(translation, rotation=(0, 0, 0), scale=(1, 1, 1)):
+        """translate @ euler_xyz @ scale (TRS) in one go
+
+        translation, rotation (rx, ry, rz), scale: 3 values, or (K, 3) arrays
+        scale can also be one number (uniform)
+        """
+        translation = np.asarray(translation, dtype=float)
+        rotation = np.asarray(rotation, dtype=float)
+        scale = np.asarray(scale, dtype=float)
+        if scale.ndim == 0:
+            scale = np.repeat(scale, 3)
+        for name, values in (("translation", translation), ("rotation", rotation), ("scale", scale)):
+            if values.ndim == 0 or values.shape[-1] != 3:
+                raise ValueError(f"compose: {name} needs 3 values per matrix, got shape {values.shape}")
+        mat = Matrix3D.euler_xyz(rotation[..., 0], rotation[..., 1], rotation[..., 2])
+        shape = np.broadcast_shapes(mat.shape[:-2], translation.shape[:-1], scale.shape[:-1])
+        mat = np.broadcast_to(mat, shape + (4, 4)).copy()
+        mat[..., 0:3, 0:3] *= scale[..., None, :]
+        mat[..., 0:3, 3] = translation
         return mat
     
+    @staticmethod
+    def affine_inverse(mat):
+        """inverse of (K, 4, 4) or (4, 4) affine matrices (last row 0, 0, 0, 1)
+
+        3x3 part by cofactors (rows of the inverse are cross products of its columns)
+        """
+        a = mat[..., 0:3, 0:3]
+        c0, c1, c2 = a[..., :, 0], a[..., :, 1], a[..., :, 2]
+        rows = np.stack([np.cross(c1, c2), np.cross(c2, c0), np.cross(c0, c1)], axis=-2)
+        det = np.sum(c0 * rows[..., 0, :], axis=-1)
+        
+        inv = identity_with(mat.shape[:-2])
+        inv[..., 0:3, 0:3] = rows / det[..., None, None]
+        inv[..., 0:3, 3] = -np.einsum("...ij,...j->...i", inv[..., 0:3, 0:3], mat[..., 0:3, 3])
+        return inv
+    
     @staticmethod
     def perspective(fov, aspect, near, far):
         """perspective & projection"""
@@ -90,8 +153,89 @@ class Matrix3D:
         mat[2, 3] = np.dot(forward, eye)
         return mat
 
+def stripify_edges(edges):
+    """chain edges into polylines
+
+    edges: edge list [[vertex 1, vertex 2], ...]
+    returns vertex index lists [[v0, v1, v2, ...], ...], every edge used once
+    """
+    neighbours = {}
+    for i, (v1, v2) in enumerate(edges):
+        neighbours.setdefault(v1, []).append((v2, i))
+        neighbours.setdefault(v2, []).append((v1, i))
+    used = [False] * len(edges)
+    
+    def walk(vertex):
+        path = []
+        while True:
+            for nxt, i in neighbours[vertex]:
+                if not used[i]:
+                    used[i] = True
+                    path.append(nxt)
+                    vertex = nxt
+                    break
+            else:
+                return path
+    
+    strips = []
+    for i, (v1, v2) in enumerate(edges):
+        if used[i]:
+            continue
+        used[i] = True
+        # grow both ends as far as possible
+        forward = walk(v2)
+        backward = walk(v1)
+        strips.append(backward[::-1] + [v1, v2] + forward)
+    return strips
+
+def strip_segments(strips, edges):
+    """flatten strips to edges in drawing order
+
+    returns (E, 2) vertex index array, (E,) bool array, True where a strip begins,
+    and (E,) index of each segment in edges
+    """
+    pairs = [(v1, v2) for strip in strips for v1, v2 in zip(strip, strip[1:])]
+    starts = [i == 0 for strip in strips for i in range(len(strip) - 1)]
+    
+    lookup = {}
+    for i, (v1, v2) in enumerate(edges):
+        lookup.setdefault((min(v1, v2), max(v1, v2)), []).append(i)
+    ids = [lookup[(min(v1, v2), max(v1, v2))].pop() for v1, v2 in pairs]
+    return (np.array(pairs, dtype=int).reshape(-1, 2), np.array(starts, dtype=bool),
+            np.array(ids, dtype=int))
+
+def read_only(array):
+    array.setflags(write=False)
+    return array
+
+class Geometry:
+    """immutable vertex/edge arrays, shared by every placement of a mesh"""
+    __slots__ = ("vertices", "edges", "homogeneous", "strips", "segment_edges", "strip_starts",
+                 "segment_ids")
+    
+    def __init__(self, vertices, edges):
+        """
+        vertices: vertex list [[x, y, z], ...]
+        edges: edge list [[vertex 1, vertex 2], ...]
+        """
+        self.vertices = read_only(np.array(vertices, dtype=float).reshape(-1, 3))
+        self.edges = read_only(np.array(edges, dtype=int).reshape(-1, 2))
+        
+        # homogeneous coord. once and for all
+        homogeneous = np.ones((len(self.vertices), 4))
+        homogeneous[:, 0:3] = self.vertices
+        self.homogeneous = read_only(homogeneous)
+        
+        edge_list = self.edges.tolist()
+        self.strips = stripify_edges(edge_list)
+        segment_edges, strip_starts, segment_ids = strip_segments(self.strips, edge_list)
+        self.segment_edges = read_only(segment_edges)
+        self.strip_starts = read_only(strip_starts)
+        self.segment_ids = read_only(segment_ids)
+
 class WireframeObject:
-    """base class of wireframe objects"""
+    """base class of wireframe objects (geometry reference + own transform/style)"""
+    __slots__ = ("geometry", "color", "is_flame", "is_warp", "transform_matrix")
     
     def __init__(self, vertices, edges, color="#00ff00"):
         """
@@ -99,12 +243,52 @@ class WireframeObject:
         edges: edge list [[vertex 1, vertex 2], ...]
         color: color
         """
-        self.vertices = np.array(vertices)
-        self.edges = edges
+        self.setup(Geometry(vertices, edges), color)
+    
+    def setup(self, geometry, color):
+        self.geometry = geometry
         self.color = color
         self.is_flame = False  # may be no use
+        self.is_warp = False
         self.transform_matrix = Matrix3D.identity()
     
+    @classmethod
+    def from_geometry(cls, geometry, color="#00ff00"):
+        obj = cls.__new__(cls)
+        obj.setup(geometry, color)
+        return obj
+    
+    def instance(self):
+        """another placement of the same geometry, same style, identity transform"""
+        obj = WireframeObject.from_geometry(self.geometry, self.color)
+        obj.is_flame = self.is_flame
+        obj.is_warp = self.is_warp
+        return obj
+    
+    @property
+    def vertices(self):
+        return self.geometry.vertices
+    
+    @property
+    def edges(self):
+        return self.geometry.edges
+    
+    @property
+    def strips(self):
+        return self.geometry.strips
+    
+    @property
+    def segment_edges(self):
+        return self.geometry.segment_edges
+    
+    @property
+    def strip_starts(self):
+        return self.geometry.strip_starts
+    
+    @property
+    def segment_ids(self):
+        return self.geometry.segment_ids
+    
     def set_transform(self, matrix):
         self.transform_matrix = matrix
     
@@ -114,23 +298,54 @@ class WireframeObject:
     
     def rotate(self, rx, ry, rz):
         """rotation in world coord. """
-        rot_x = Matrix3D.rotate_x(rx)
-        rot_y = Matrix3D.rotate_y(ry)
-        rot_z = Matrix3D.rotate_z(rz)
-        self.transform_matrix = rot_z @ rot_y @ rot_x @ self.transform_matrix
+        self.transform_matrix = Matrix3D.euler_xyz(rx, ry, rz) @ self.transform_matrix
     
     def scale(self, sx, sy, sz):
         self.transform_matrix = Matrix3D.scale(sx, sy, sz) @ self.transform_matrix
     
     def get_transformed_vertices(self):
-        # translate to homogeneous coord.
-        homogeneous = np.ones((len(self.vertices), 4))
-        homogeneous[:, 0:3] = self.vertices
-        
-        # do it!!
-        transformed = (self.transform_matrix @ homogeneous.T).T
-        
-        return transformed
+        # do it!! (vertices are already in homogeneous coord.)
+        return self.geometry.homogeneous @ self.transform_matrix.T
+
+class GeometryCache:
+    """geometry assets keyed by generator and its parameters
+
+    the generator (e.g. create_cube) runs once per parameter set, later calls
+    get a new WireframeObject sharing the read-only geometry of the first one
+    """
+    def __init__(self):
+        self.assets = {}
+    
+    def get(self, generator, *args, **kwargs):
+        # same key for create_cube(), create_cube(1.0) and create_cube(size=1.0)
+        bound = inspect.signature(generator).bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (generator, bound.args, tuple(sorted(bound.kwargs.items())))
+        try:
+            prototype = self.assets.get(key)
+        except TypeError:
+            # unhashable parameters, can't share
+            return generator(*args, **kwargs)
+        if prototype is None:
+            prototype = generator(*args, **kwargs)
+            self.assets[key] = prototype
+        return prototype.instance()
+    
+    def clear(self):
+        self.assets.clear()
+    
+    def __len__(self):
+        return len(self.assets)
+
+geometry_cache = GeometryCache()
+
+def cached_geometry(generator):
+    """decorator: share the geometry of generator(...) results through geometry_cache"""
+    @functools.wraps(generator)
+    def wrapper(*args, **kwargs):
+        return geometry_cache.get(generator, *args, **kwargs)
+    wrapper.uncached = generator
+    return wrapper
 
 class Camera:
     def __init__(self, position, target, up, fov=60, aspect=1.0, near=0.1, far=100):
@@ -150,16 +365,385 @@ class Camera:
         self.view_matrix = Matrix3D.look_at(self.position, self.target, self.up)
         self.projection_matrix = Matrix3D.perspective(self.fov, self.aspect, self.near, self.far)
 
+# depth shaded channels of the base colors, anything else is shaded as white
+SHADE_CHANNELS = {
+    "#00ff00": (0, 1, 0),
+    "#ff0000": (1, 0, 0),
+    "#0000ff": (0, 0, 1),
+    "#ffff00": (1, 1, 0),
+    "#ff00ff": (1, 0, 1),
+    "#00ffff": (0, 1, 1),
+}
+
+# color names rgb() resolves without Tk (same in every Tk version)
+HEADLESS_COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "cyan": (0, 255, 255),
+    "magenta": (255, 0, 255),
+}
+
+class ProjectedFrame:
+    """projected segments of one frame (visible edges only, drawing order)
+
+    coords: (K, 4) x1, y1, x2, y2 in screen coord.
+    colors: (K, 3) uint8 rgb
+    widths: (K,) line width
+    chained: (K,) True if the segment starts where the previous one ended
+    object_ids: (K,) index into renderer.objects
+    edge_ids: (K,) index into the object's edges
+    views: [(start, end, Viewport), ...] segment ranges of each viewport, or None
+    """
+    FIELDS = ("coords", "colors", "widths", "chained", "object_ids", "edge_ids")
+    
+    def __init__(self, coords, colors, widths, chained, object_ids, edge_ids, views=None):
+        self.coords = coords
+        self.colors = colors
+        self.widths = widths
+        self.chained = chained
+        self.object_ids = object_ids
+        self.edge_ids = edge_ids
+        self.views = views
+    
+    @staticmethod
+    def concatenate(frames):
+        if not frames:
+            return ProjectedFrame.from_records(np.zeros(0, dtype=SEGMENT_DTYPE))
+        return ProjectedFrame(*[np.concatenate([getattr(f, name) for f in frames])
+                                for name in ProjectedFrame.FIELDS])
+    
+    @staticmethod
+    def from_records(records):
+        """ProjectedFrame viewing a SEGMENT_DTYPE array (no copy)"""
+        return ProjectedFrame(*[records[name] for name in ProjectedFrame.FIELDS])
+    
+    def to_records(self):
+        records = np.empty(len(self), dtype=SEGMENT_DTYPE)
+        for name in self.FIELDS:
+            records[name] = getattr(self, name)
+        return records
+    
+    def views_to_list(self):
+        """views as json-able [[start, end, viewport dict or None], ...], or None"""
+        if self.views is None:
+            return None
+        return [[start, end, viewport.to_dict() if viewport is not None else None]
+                for start, end, viewport in self.views]
+    
+    @staticmethod
+    def views_from_list(views):
+        """inverse of views_to_list (the viewports come back without camera)"""
+        if views is None:
+            return None
+        return [(start, end, Viewport.from_dict(v) if v is not None else None)
+                for start, end, v in views]
+    
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.FIELDS)
+    
+    def __len__(self):
+        return len(self.coords)
+
+# one projected segment, packed (bake files and such)
+SEGMENT_DTYPE = np.dtype([
+    ("coords", "<f8", (4,)),
+    ("colors", "u1", (3,)),
+    ("widths", "u1"),
+    ("chained", "?"),
+    ("object_ids", "<i4"),
+    ("edge_ids", "<i4"),
+])
+
+class ScreenIndex:
+    """uniform grid over the segments of a ProjectedFrame, for picking
+
+    each cell lists the segments whose bounding box touches it
+    """
+    def __init__(self, frame, width, height, cell_size=32):
+        self.frame = frame
+        self.cell_size = cell_size
+        self.columns = max(1, int(math.ceil(width / cell_size)))
+        self.rows = max(1, int(math.ceil(height / cell_size)))
+        
+        coords = frame.coords
+        x0, x1 = self.cell_range(np.minimum(coords[:, 0], coords[:, 2]),
+                                 np.maximum(coords[:, 0], coords[:, 2]), self.columns)
+        y0, y1 = self.cell_range(np.minimum(coords[:, 1], coords[:, 3]),
+                                 np.maximum(coords[:, 1], coords[:, 3]), self.rows)
+        
+        # (segment, cell) pairs for every cell of every bounding box
+        nx = x1 - x0 + 1
+        counts = nx * (y1 - y0 + 1)
+        seg = np.repeat(np.arange(len(coords)), counts)
+        k = np.arange(len(seg)) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = (y0[seg] + k // nx[seg]) * self.columns + x0[seg] + k % nx[seg]
+        
+        # CSR: segments of cell c are cell_segments[cell_starts[c]:cell_starts[c + 1]]
+        order = np.argsort(cells, kind="stable")
+        self.cell_segments = seg[order]
+        self.cell_starts = np.zeros(self.columns * self.rows + 1, dtype=int)
+        np.cumsum(np.bincount(cells, minlength=self.columns * self.rows),
+                  out=self.cell_starts[1:])
+    
+    def cell_range(self, low, high, count):
+        first = np.clip((low // self.cell_size).astype(int), 0, count - 1)
+        last = np.clip((high // self.cell_size).astype(int), 0, count - 1)
+        return first, last
+    
+    def nearest(self, x, y, radius, ranges=None):
+        """(object_id, edge_id, distance, segment) of the segment closest to (x, y), or None
+
+        ranges: [(start, end), ...] only segments in these ranges count, None for all
+        """
+        x0, x1 = self.cell_range(np.array([x - radius]), np.array([x + radius]), self.columns)
+        y0, y1 = self.cell_range(np.array([y - radius]), np.array([y + radius]), self.rows)
+        candidates = []
+        for row in range(y0[0], y1[0] + 1):
+            first = self.cell_starts[row * self.columns + x0[0]]
+            last = self.cell_starts[row * self.columns + x1[0] + 1]
+            candidates.append(self.cell_segments[first:last])
+        candidates = np.unique(np.concatenate(candidates))
+        if ranges is not None:
+            allowed = np.zeros(len(candidates), dtype=bool)
+            for start, end in ranges:
+                allowed |= (candidates >= start) & (candidates < end)
+            candidates = candidates[allowed]
+        if len(candidates) == 0:
+            return None
+        
+        # point to segment distance
+        ax, ay, bx, by = self.frame.coords[candidates].T
+        dx = bx - ax
+        dy = by - ay
+        length2 = dx * dx + dy * dy
+        t = np.clip(((x - ax) * dx + (y - ay) * dy) / np.where(length2 > 0, length2, 1), 0, 1)
+        distance = np.hypot(ax + t * dx - x, ay + t * dy - y)
+        
+        best = np.argmin(distance)
+        if distance[best] > radius:
+            return None
+        segment = candidates[best]
+        return (int(self.frame.object_ids[segment]), int(self.frame.edge_ids[segment]),
+                float(distance[best]), int(segment))
+
+# bake file: BAKE_MAGIC, uint32 header length, json header, SEGMENT_DTYPE records,
+# int64 offsets of every view of every frame (frame count * views + 1), int64 frame count
+# (views: len(header["viewports"]), 1 if that's null)
+BAKE_MAGIC = b"WI3DBAK1"
+
+class BakedAnimation:
+    """projected frames of a periodic animation, replayed instead of re-rendered
+
+    frames are kept in memory up to max_bytes, frames that don't fit any more
+    are rendered live every time. (no eviction: replay walks the loop in order,
+    LRU would always drop the frame needed next.)
+    a bake written by save() is memory-mapped by load() instead.
+    """
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self.frames = {}
+        self.nbytes = 0
+        self.records = None  # memory-mapped SEGMENT_DTYPE array
+        self.offsets = None  # frame i is records[offsets[i]:offsets[i + 1]]
+        self.view_offsets = None  # view j of frame i starts at view_offsets[i * len(viewports) + j]
+        self.viewports = None  # of the frames in the file, or None
+        self.meta = None  # of a loaded bake file
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        if self.offsets is not None:
+            return len(self.offsets) - 1
+        return len(self.frames)
+    
+    def get(self, index):
+        """cached ProjectedFrame or None"""
+        if self.offsets is not None:
+            if not 0 <= index < len(self.offsets) - 1:
+                return None
+            start = self.offsets[index]
+            frame = ProjectedFrame.from_records(self.records[start:self.offsets[index + 1]])
+            if self.viewports is not None:
+                bounds = (self.view_offsets[index * len(self.viewports):
+                                            (index + 1) * len(self.viewports) + 1] - start).tolist()
+                frame.views = [(bounds[j], bounds[j + 1], viewport)
+                               for j, viewport in enumerate(self.viewports)]
+            return frame
+        return self.frames.get(index)
+    
+    def put(self, index, frame):
+        """keep frame if it fits under max_bytes, returns True if kept"""
+        if self.offsets is not None:
+            return False
+        old = self.frames.get(index)
+        nbytes = self.nbytes - (old.nbytes if old is not None else 0) + frame.nbytes
+        if nbytes > self.max_bytes:
+            return False
+        self.frames[index] = frame
+        self.nbytes = nbytes
+        return True
+    
+    def frame(self, index, render):
+        """cached frame, or render() it live (and keep it if there's room)"""
+        frame = self.get(index)
+        if frame is not None:
+            self.hits += 1
+            return frame
+        self.misses += 1
+        frame = render()
+        self.put(index, frame)
+        return frame
+    
+    def bake(self, frames):
+        """frames: ProjectedFrames of one whole loop, in order
+
+        stops at the first frame that doesn't fit, the rest of the loop is rendered live
+        """
+        for index, frame in enumerate(frames):
+            if not self.put(index, frame):
+                break
+    
+    @staticmethod
+    def save(path, frames, meta=None):
+        """stream frames of one loop to path, frame by frame
+
+        written to path + ".tmp" and renamed when complete, an interrupted bake leaves no file.
+        meta: json-able description of what was baked (scene parameters), checked by load()
+        all frames need the same viewports (rectangles and colors are stored once)
+        """
+        frames = iter(frames)
+        first = next(frames, None)
+        viewports = None
+        if first is not None:
+            frames = itertools.chain([first], frames)
+            if first.views is not None:
+                viewports = [v for _, _, v in first.views_to_list()]
+        data = json.dumps({"meta": meta, "dtype": SEGMENT_DTYPE.descr,
+                           "viewports": viewports}).encode()
+        offsets = [0]
+        count = 0
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(BAKE_MAGIC + struct.pack("<I", len(data)) + data)
+                for frame in frames:
+                    if viewports is None:
+                        ends = [len(frame)]
+                    elif frame.views is not None and len(frame.views) == len(viewports):
+                        ends = [end for _, end, _ in frame.views]
+                    else:
+                        raise ValueError("frames of a bake need the same viewports")
+                    frame.to_records().tofile(f)
+                    base = offsets[-1]
+                    offsets.extend(base + end for end in ends)
+                    count += 1
+                np.array(offsets, dtype="<i8").tofile(f)
+                f.write(struct.pack("<q", count))
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+    
+    @classmethod
+    def load(cls, path, meta=None):
+        """memory-map a bake written by save()
+
+        ValueError if path isn't a complete bake, has another record layout
+        (SEGMENT_DTYPE changed since), or meta differs from the baked one
+        """
+        with open(path, "rb") as f:
+            if f.read(len(BAKE_MAGIC)) != BAKE_MAGIC:
+                raise ValueError(f"{path}: not a bake file")
+            (length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(length))
+            start = len(BAKE_MAGIC) + 4 + length
+            views = len(header["viewports"]) if header.get("viewports") is not None else 1
+            size = f.seek(0, os.SEEK_END)
+            f.seek(-8, os.SEEK_END)
+            (count,) = struct.unpack("<q", f.read(8))
+            entries = count * views + 2  # offsets and the count
+            if not 0 <= count <= ((size - start) // 8 - 2) // views:
+                raise ValueError(f"{path}: truncated bake file")
+            f.seek(-8 * entries, os.SEEK_END)
+            view_offsets = np.fromfile(f, dtype="<i8", count=entries - 1)
+        if (header.get("dtype") != json.loads(json.dumps(SEGMENT_DTYPE.descr))
+                or size != start + int(view_offsets[-1]) * SEGMENT_DTYPE.itemsize + 8 * entries):
+            raise ValueError(f"{path}: other segment record layout")
+        if meta is not None and header["meta"] != json.loads(json.dumps(meta)):
+            raise ValueError(f"{path}: baked for {header['meta']}")
+        
+        baked = cls()
+        baked.meta = header["meta"]
+        baked.view_offsets = view_offsets
+        baked.offsets = view_offsets[::views]
+        if header.get("viewports") is not None:
+            baked.viewports = [Viewport.from_dict(v) for v in header["viewports"]]
+        if view_offsets[-1] > 0:
+            baked.records = np.memmap(path, dtype=SEGMENT_DTYPE, mode="r",
+                                      offset=start, shape=(int(view_offsets[-1]),))
+        else:
+            baked.records = np.zeros(0, dtype=SEGMENT_DTYPE)
+        return baked
+
+class Viewport:
+    """a camera drawn into a rectangle of the canvas (split-screen, picture-in-picture)
+
+    background: fill color of the rectangle, None for transparent
+    outline: border color, None for no border
+    """
+    def __init__(self, camera, x, y, width, height, background=None, outline=None):
+        self.camera = camera
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.background = background
+        self.outline = outline
+    
+    def to_dict(self):
+        """rectangle and colors (json-able), no camera"""
+        return {"x": self.x, "y": self.y, "width": self.width, "height": self.height,
+                "background": self.background, "outline": self.outline}
+    
+    @staticmethod
+    def from_dict(values, camera=None):
+        return Viewport(camera, values["x"], values["y"], values["width"], values["height"],
+                        values["background"], values["outline"])
+
 class WireframeRenderer:
-    """rendering class"""
-    def __init__(self, canvas, width, height):
+    """rendering class
+
+    display_mode "vector": one canvas line item per polyline
+    display_mode "image": rasterize into a numpy buffer, one PhotoImage put per frame
+    
+    without viewports the whole canvas shows self.camera. with viewports, object
+    transforms are done once per frame and projected for every viewport at once.
+    """
+    def __init__(self, canvas, width, height, display_mode="vector"):
+        """canvas: tk Canvas, or None to render headless"""
         self.canvas = canvas
         self.width = width
         self.height = height
         self.camera = Camera([0, 0, 5], [0, 0, 0], [0, 1, 0], aspect=width/height)
         self.objects = []
+        self.viewports = []
         self.f_time = 0
         self.w_time = 0
+        # None: exact colors, N: depth shading in N steps (longer polylines)
+        self.intensity_levels = None
+        self.background = (0, 0, 0)
+        self.frame = None        # last ProjectedFrame
+        self.pick_index = None   # ScreenIndex of self.frame, built on first pick
+        self.framebuffer = None  # (height, width, 3) uint8, image mode only
+        self.clear_buffer = None
+        self.image = None
+        self.image_item = None
+        self.display_mode = None
+        self.set_display_mode(display_mode)
     
     def add_object(self, obj):
         self.objects.append(obj)
@@ -167,6 +751,35 @@ class WireframeRenderer:
     def set_camera(self, camera):
         self.camera = camera
     
+    def add_viewport(self, viewport):
+        self.viewports.append(viewport)
+    
+    def get_viewports(self):
+        if self.viewports:
+            return self.viewports
+        return [Viewport(self.camera, 0, 0, self.width, self.height)]
+    
+    def set_display_mode(self, mode):
+        if mode not in ("vector", "image"):
+            raise ValueError(f"unknown display mode: {mode}")
+        if mode == self.display_mode:
+            return
+        self.image_item = None
+        if mode == "image":
+            self.framebuffer = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+            self.clear_buffer = np.empty_like(self.framebuffer)
+            self.clear_buffer[:] = self.background
+        self.display_mode = mode
+        
+        # canvas None: headless, project_scene() / rasterize() only
+        if self.canvas is None:
+            return
+        self.canvas.delete("all")
+        if mode == "image":
+            if self.image is None:
+                self.image = tk.PhotoImage(master=self.canvas, width=self.width, height=self.height)
+            self.image_item = self.canvas.create_image(0, 0, anchor="nw", image=self.image)
+    
     def world_to_screen(self, world_pos):
         # view transform
         view_pos = self.camera.view_matrix @ world_pos
@@ -186,91 +799,298 @@ class WireframeRenderer:
         
         return screen_x, screen_y, ndc[2]
     
-    def render(self):
-        self.canvas.delete("all")
+    def project(self, world_vertices, viewports=None):
+        """world_to_screen for a (N, 4) array, all viewports in one batched call
+
+        returns (V, N, 3) screen x, y, depth (viewport local), or (N, 3) for self.camera
+        """
+        single = viewports is None
+        if single:
+            viewports = [Viewport(self.camera, 0, 0, self.width, self.height)]
+        view_matrices = np.stack([v.camera.view_matrix for v in viewports])
+        projection_matrices = np.stack([v.camera.projection_matrix for v in viewports])
+        view = world_vertices @ view_matrices.transpose(0, 2, 1)
+        proj = view @ projection_matrices.transpose(0, 2, 1)
         
-        for obj in self.objects:
-            # retreive each the transformed vertices
-            transformed_vertices = obj.get_transformed_vertices()
+        # clipping → NDC
+        w = proj[..., 3:4]
+        ndc = np.where(w != 0, proj / np.where(w != 0, w, 1), proj + 10)
+        
+        # viewport
+        widths = np.array([v.width for v in viewports], dtype=float)[:, None]
+        heights = np.array([v.height for v in viewports], dtype=float)[:, None]
+        screen = np.empty(ndc.shape[:-1] + (3,))
+        screen[..., 0] = (ndc[..., 0] + 1) * widths / 2
+        screen[..., 1] = (1 - ndc[..., 1]) * heights / 2
+        screen[..., 2] = ndc[..., 2]
+        return screen[0] if single else screen
+    
+    def quantize(self, value):
+        """snap to intensity_levels steps (so neighbour edges can share one line)"""
+        if not self.intensity_levels:
+            return value
+        return np.round(value * self.intensity_levels) / self.intensity_levels
+    
+    def project_object(self, obj, object_id, transformed_vertices, screen, viewport):
+        """visible segments of one object as a ProjectedFrame
+
+        screen: (N, 3) projected transformed_vertices, local to viewport
+        """
+        n = len(screen)
+        edges = obj.segment_edges
+        
+        # edge's id is legal or not
+        valid = (edges[:, 0] < n) & (edges[:, 1] < n)
+        v1 = np.where(valid, edges[:, 0], 0)
+        v2 = np.where(valid, edges[:, 1], 0)
+        p1 = screen[v1]
+        p2 = screen[v2]
+        
+        # clipping, and in the screen?
+        visible = valid.copy()
+        for p in (p1, p2):
+            visible &= (p[:, 2] >= -1) & (p[:, 2] <= 1)
+            visible &= (p[:, 0] >= 0) & (p[:, 0] <= viewport.width)
+            visible &= (p[:, 1] >= 0) & (p[:, 1] <= viewport.height)
+        
+        # chained: previous edge of the same strip was drawn too
+        chained = np.zeros(len(edges), dtype=bool)
+        chained[1:] = visible[:-1] & ~obj.strip_starts[1:]
+        
+        p1 = p1[visible]
+        p2 = p2[visible]
+        chained = chained[visible]
+        k = len(p1)
+        
+        # color factor( don't think good idea...)
+        depth_factor = (p1[:, 2] + p2[:, 2]) / 2
+        intensity = self.quantize(np.maximum(0.1, 1 - depth_factor * 0.5))
+        
+        # flames flicker along with a per-edge clock
+        t = None
+        if getattr(obj, 'is_flame', False):
+            t = self.f_time + np.cumsum(np.full(k, 0.05))
+            if k:
+                self.f_time = t[-1]
+            xxx_intensity = 80
+        if getattr(obj, 'is_warp', False):
+            t = self.w_time + np.cumsum(np.full(k, 0.03))
+            if k:
+                self.w_time = t[-1]
+            xxx_intensity = 180
+        
+        colors = np.empty((k, 3), dtype=np.uint8)
+        if t is not None:
+            flame_start_z = -3.5
+            flame_end_z = -10.5
+            avg_z = (transformed_vertices[v1[visible], 2] + transformed_vertices[v2[visible], 2]) / 2
             
-            # transform to screen 
-            screen_vertices = []
-            for vertex in transformed_vertices:
-                screen_x, screen_y, depth = self.world_to_screen(vertex)
-                screen_vertices.append((screen_x, screen_y, depth))
+            transparency = ((avg_z - flame_end_z) * (1 - np.cos(t) / 3)
+                            ) / (flame_start_z - flame_end_z)
+            transparency = np.clip(self.quantize(transparency), 0.0, 1.0)
+            inside = (flame_end_z <= avg_z) & (avg_z <= flame_start_z)
+            transparency = np.where(inside, transparency, 1.0)
             
-            # traverse edges
-            for edge in obj.edges:
-                v1_idx, v2_idx = edge
-                
-                # edge's id is legal or not
-                if v1_idx >= len(screen_vertices) or v2_idx >= len(screen_vertices):
-                    continue
-                
-                x1, y1, z1 = screen_vertices[v1_idx]
-                x2, y2, z2 = screen_vertices[v2_idx]
-                
-                # clipping
-                if z1 < -1 or z1 > 1 or z2 < -1 or z2 > 1:
-                    continue
-                
-                # in the screen?
-                if (0 <= x1 <= self.width and 0 <= y1 <= self.height and
-                    0 <= x2 <= self.width and 0 <= y2 <= self.height):
-                    
-                    # color factor( don't think good idea...)
-                    depth_factor = (z1 + z2) / 2
-                    intensity = max(0.1, 1 - depth_factor * 0.5)
-                    
-                    t = None
-                    if hasattr(obj, 'is_flame') and obj.is_flame:
-                        self.f_time += 0.05
-                        xxx_intensity = 80
-                        t = self.f_time
-                    if hasattr(obj, 'is_warp') and obj.is_warp:
-                        self.w_time += 0.03
-                        t = self.w_time
-                        xxx_intensity = 180
-                    if t:
-                        flame_start_z = -3.5
-                        flame_end_z = -10.5
-                        avg_z = (transformed_vertices[v1_idx][2] + transformed_vertices[v2_idx][2]) / 2
-                        
-                        if flame_end_z <= avg_z <= flame_start_z:
-                            transparency = ((avg_z - flame_end_z) * (1 - math.cos(t) /3)
-                                            )/ (flame_start_z - flame_end_z)
-                            transparency = max(0.0, min(1.0, transparency))
-                        else:
-                            transparency = 1.0
-                        
-                        red_intensity = int(255 * intensity * transparency)
-                        color = f"#{red_intensity:02x}{xxx_intensity:02x}{xxx_intensity:02x}"
-                        line_width = max(1, int(4 * transparency))
-                    else:
-                        # color procedure for normal object 
-                        if obj.color.startswith('#'):
-                            base_color = obj.color
-                        else:
-                            base_color = "#00ff00"
-                        
-                        line_width = 2
-                        
-                        # depth intensity must be reflect to color
-                        if base_color == "#00ff00": 
-                            color = f"#{0:02x}{int(intensity*255):02x}{0:02x}"
-                        elif base_color == "#ff0000":
-                            color = f"#{int(intensity*255):02x}{0:02x}{0:02x}"
-                        elif base_color == "#0000ff":
-                            color = f"#{0:02x}{0:02x}{int(intensity*255):02x}"
-                        elif base_color == "#ffff00":
-                            color = f"#{int(intensity*255):02x}{int(intensity*255):02x}{0:02x}"
-                        elif base_color == "#ff00ff":
-                            color = f"#{int(intensity*255):02x}{0:02x}{int(intensity*255):02x}"
-                        elif base_color == "#00ffff":
-                            color = f"#{0:02x}{int(intensity*255):02x}{int(intensity*255):02x}"
-                        else:
-                            color = f"#{int(intensity*255):02x}{int(intensity*255):02x}{int(intensity*255):02x}"
-                    
-                    self.canvas.create_line(x1, y1, x2, y2, fill=color, width=line_width)
+            colors[:, 0] = np.clip((255 * intensity * transparency).astype(int), 0, 255)
+            colors[:, 1:] = xxx_intensity
+            widths = np.maximum(1, (4 * transparency).astype(int))
+        else:
+            # color procedure for normal object 
+            base_color = obj.color if obj.color.startswith('#') else "#00ff00"
+            channels = np.array(SHADE_CHANNELS.get(base_color, (1, 1, 1)))
+            # intensity goes up to 1.5 near the near plane (z < 0), don't wrap the uint8
+            colors[:] = np.clip((intensity * 255).astype(int), 0, 255)[:, None] * channels
+            widths = np.full(k, 2)
+        
+        coords = np.hstack([p1[:, 0:2], p2[:, 0:2]])
+        coords += (viewport.x, viewport.y, viewport.x, viewport.y)
+        return ProjectedFrame(coords, colors, widths, chained, np.full(k, object_id),
+                              obj.segment_ids[visible])
+    
+    def transform_scene(self):
+        """world vertices of all objects, once per frame
 
+        returns transformed vertex list and (N_total, 4) stacked array
+        """
+        transformed = [obj.get_transformed_vertices() for obj in self.objects]
+        if not transformed:
+            return transformed, np.zeros((0, 4))
+        return transformed, np.concatenate(transformed)
+    
+    def project_scene(self):
+        transformed, world = self.transform_scene()
+        viewports = self.get_viewports()
+        screens = self.project(world, viewports)
+        
+        frames = []
+        views = []
+        for viewport, screen in zip(viewports, screens):
+            start = sum(len(f) for f in frames)
+            offset = 0
+            for i, (obj, vertices) in enumerate(zip(self.objects, transformed)):
+                frames.append(self.project_object(obj, i, vertices,
+                                                  screen[offset:offset + len(vertices)], viewport))
+                offset += len(vertices)
+            views.append((start, sum(len(f) for f in frames), viewport))
+        frame = ProjectedFrame.concatenate(frames)
+        frame.views = views
+        return frame
+    
+    def render(self):
+        self.present(self.project_scene())
+    
+    def present(self, frame):
+        """draw an already projected frame (e.g. from a BakedAnimation)"""
+        self.frame = frame
+        if self.display_mode == "image":
+            self.draw_image(self.frame)
+        else:
+            self.draw_vector(self.frame)
+    
+    def pick(self, x, y, radius=5):
+        """edge drawn nearest to canvas point (x, y), within radius pixels
 
+        returns (object_id, edge_id, distance, view) or None, object_id indexes self.objects,
+        edge_id the object's edges and view the frame's views (0 without views).
+        only viewports seen at (x, y) count: the topmost one containing it, and the ones
+        under it down to the first with a background. uses the last frame, nothing is
+        re-projected.
+        """
+        if self.frame is None:
+            return None
+        if self.pick_index is None or self.pick_index.frame is not self.frame:
+            self.pick_index = ScreenIndex(self.frame, self.width, self.height)
+        views = self.view_ranges(self.frame)
+        ranges = []
+        for start, end, viewport in reversed(views):
+            if viewport is None:
+                ranges.append((start, end))
+            elif (viewport.x <= x < viewport.x + viewport.width
+                    and viewport.y <= y < viewport.y + viewport.height):
+                ranges.append((start, end))
+                if viewport.background:
+                    break  # covers the ones below
+        hit = self.pick_index.nearest(x, y, radius, ranges)
+        if hit is None:
+            return None
+        object_id, edge_id, distance, segment = hit
+        view = next(i for i, (start, end, _) in enumerate(views) if start <= segment < end)
+        return object_id, edge_id, distance, view
+    
+    def view_ranges(self, frame):
+        if frame.views is None:
+            return [(0, len(frame), None)]
+        return frame.views
+    
+    def draw_vector(self, frame):
+        """one create_line per run of chained, same looking segments"""
+        self.canvas.delete("all")
+        
+        for start, end, viewport in self.view_ranges(frame):
+            if viewport is not None and (viewport.background or viewport.outline):
+                self.canvas.create_rectangle(viewport.x, viewport.y,
+                                             viewport.x + viewport.width, viewport.y + viewport.height,
+                                             fill=viewport.background or "",
+                                             outline=viewport.outline or "")
+            self.draw_lines(frame, start, end)
+    
+    def draw_lines(self, frame, start, end):
+        coords = frame.coords[start:end].tolist()
+        colors = frame.colors[start:end].tolist()
+        widths = frame.widths[start:end].tolist()
+        chained = frame.chained[start:end].tolist()
+        points = []
+        style = None
+        for seg, rgb, line_width, joined in zip(coords, colors, widths, chained):
+            seg_style = (tuple(rgb), line_width)
+            if joined and seg_style == style:
+                points.extend(seg[2:4])
+                continue
+            self.draw_polyline(points, style)
+            points = list(seg)
+            style = seg_style
+        self.draw_polyline(points, style)
+    
+    def draw_polyline(self, points, style):
+        """points: flat [x1, y1, x2, y2, ...], style: ((r, g, b), width)"""
+        if len(points) < 4:
+            return
+        (r, g, b), line_width = style
+        self.canvas.create_line(*points, fill=f"#{r:02x}{g:02x}{b:02x}", width=line_width)
+    
+    def rasterize(self, frame):
+        """draw the segments into self.framebuffer"""
+        fb = self.framebuffer
+        np.copyto(fb, self.clear_buffer)
+        
+        for start, end, viewport in self.view_ranges(frame):
+            if viewport is not None and viewport.background:
+                fb[viewport.y:viewport.y + viewport.height,
+                   viewport.x:viewport.x + viewport.width] = self.rgb(viewport.background)
+            if viewport is not None and viewport.outline:
+                self.raster_outline(viewport)
+            self.raster_segments(frame.coords[start:end], frame.colors[start:end],
+                                 frame.widths[start:end])
+        return fb
+    
+    def raster_outline(self, viewport):
+        rgb = self.rgb(viewport.outline)
+        x1 = max(viewport.x, 0)
+        y1 = max(viewport.y, 0)
+        x2 = min(viewport.x + viewport.width, self.width) - 1
+        y2 = min(viewport.y + viewport.height, self.height) - 1
+        fb = self.framebuffer
+        fb[y1:y2 + 1, [x1, x2]] = rgb
+        fb[[y1, y2], x1:x2 + 1] = rgb
+    
+    def raster_segments(self, coords, colors, widths):
+        """DDA, all segments at once"""
+        if len(coords) == 0:
+            return
+        
+        x1, y1, x2, y2 = coords.T
+        dx = x2 - x1
+        dy = y2 - y1
+        steps = np.maximum(np.abs(dx), np.abs(dy)).astype(int) + 1
+        seg = np.repeat(np.arange(len(steps)), steps)
+        offsets = np.cumsum(steps) - steps
+        t = (np.arange(len(seg)) - offsets[seg]) / np.maximum(steps - 1, 1)[seg]
+        xs = np.rint(x1[seg] + dx[seg] * t).astype(int)
+        ys = np.rint(y1[seg] + dy[seg] * t).astype(int)
+        
+        # thick lines: repeat the pixels across the minor axis
+        steep = (np.abs(dy) > np.abs(dx))[seg]
+        seg_widths = widths[seg].astype(int)  # uint8 from records, o - (w - 1) // 2 would wrap
+        pixels = self.framebuffer.reshape(-1, 3)
+        for o in range(int(widths.max())):
+            use = seg_widths > o
+            shift = o - (seg_widths[use] - 1) // 2
+            px = xs[use] + np.where(steep[use], shift, 0)
+            py = ys[use] + np.where(steep[use], 0, shift)
+            inside = (px >= 0) & (px < self.width) & (py >= 0) & (py < self.height)
+            pixels[py[inside] * self.width + px[inside]] = colors[seg[use][inside]]
+    
+    def rgb(self, color):
+        """Tk color name -> (r, g, b) 0..255
+
+        headless: "#rrggbb" or a name in HEADLESS_COLORS only
+        """
+        if self.canvas is not None:
+            return tuple(c // 257 for c in self.canvas.winfo_rgb(color))
+        if color.lower() in HEADLESS_COLORS:
+            return HEADLESS_COLORS[color.lower()]
+        if len(color) == 7 and color[0] == "#":
+            try:
+                return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+            except ValueError:
+                pass
+        raise ValueError(f"color {color!r}: without a canvas use \"#rrggbb\" or one of "
+                         f"{', '.join(HEADLESS_COLORS)}")
+    
+    def draw_image(self, frame):
+        self.put_image(self.rasterize(frame))
+    
+    def put_image(self, fb):
+        """one put of a whole (height, width, 3) frame into the reused PhotoImage"""
+        header = f"P6 {self.width} {self.height} 255 ".encode()
+        self.image.put(header + fb.tobytes())